@@ -29,6 +29,16 @@ async function main() {
       description: 'Base ZMQ port (will use base-port to base-port+num-bots-1)',
       default: 5555
     })
+    .option('transport', {
+      type: 'string',
+      choices: ['tcp', 'ipc'],
+      description: 'ZMQ transport; ipc uses Unix domain sockets and needs the Python client on this machine',
+      default: 'tcp'
+    })
+    .option('vec-port', {
+      type: 'number',
+      description: 'ZMQ port stepping all bots in one request (defaults to base-port - 1)'
+    })
     .help()
     .alias('help', 'h')
     .argv;
@@ -54,7 +64,9 @@ async function main() {
       host: argv.ip,
       port: argv.port,
       numBots: argv['num-bots'],
-      basePort: argv['base-port']
+      basePort: argv['base-port'],
+      vecPort: argv['vec-port'],
+      transport: argv.transport
     });
 
     await server.init();
@@ -3,34 +3,100 @@ Callbacks for Stable-Baselines3 integration with Weights & Biases
 Provides logging functionality during training
 """
 
+import logging
+import queue
+import threading
+from collections import deque
+
 import numpy as np
 import wandb
 from stable_baselines3.common.callbacks import BaseCallback
 
+logger = logging.getLogger(__name__)
+
 class ParallelLoggingCallback(BaseCallback):
     """
     Custom callback for logging training progress with W&B integration for parallel environments
     """
-    def __init__(self, verbose=0):
+    def __init__(self, verbose=0, flush_freq=200):
         """
         Initialize the callback
         
         Args:
             verbose (int): Verbosity level
+            flush_freq (int): Send buffered metrics to W&B every this many timesteps
         """
         super(ParallelLoggingCallback, self).__init__(verbose)
-        self.episode_rewards = []
+        self.flush_freq = flush_freq
+        # Metrics buffered until the next flush, later values overwrite earlier ones
+        self._pending = {}
+        # num_timesteps at the last flush (it advances by n_envs per step)
+        self._last_flush = 0
+        # Flushed metrics waiting for the background W&B logging thread
+        self._log_queue = queue.Queue(maxsize=1024)
+        self._log_thread = None
+        # Rewards of the last 10 finished episodes and their running sum
+        self.episode_rewards = deque(maxlen=10)
+        self._recent_sum = 0.0
         self.episode_lengths = []
         self.current_episode_rewards = None
         self.logs_collected = None
+        self.bot_ids = None
         self.bot_logs = None
     
     def _on_training_start(self) -> None:
         """Initialize tracking arrays based on number of environments"""
+        # W&B calls run on their own thread so training never waits on them
+        self._log_thread = threading.Thread(target=self._drain_log_queue, daemon=True)
+        self._log_thread.start()
+        
         num_envs = self.model.n_envs
         self.current_episode_rewards = np.zeros(num_envs)
         self.logs_collected = np.zeros(num_envs)
-        self.bot_logs = [[] for _ in range(num_envs)]
+        
+        # Bot names and W&B keys per environment, built once instead of every log
+        self.bot_ids = [None] * num_envs
+        self.bot_logs = [None] * num_envs
+        self._reward_keys = [None] * num_envs
+        self._logs_keys = [None] * num_envs
+        self._ep_reward_keys = [None] * num_envs
+        self._ep_logs_keys = [None] * num_envs
+        self._ep_avg_keys = [None] * num_envs
+        for i in range(num_envs):
+            self._set_bot_name(i, i)
+    
+    def _set_bot_name(self, i, bot_id):
+        """
+        Cache the bot name and W&B keys for one environment
+        
+        Args:
+            i (int): Environment index
+            bot_id (int): Bot ID reported by the environment
+        """
+        bot_name = f"Bot-{bot_id}"
+        self.bot_ids[i] = bot_id
+        self.bot_logs[i] = bot_name
+        self._reward_keys[i] = f"{bot_name}/reward"
+        self._logs_keys[i] = f"{bot_name}/logs_collected"
+        self._ep_reward_keys[i] = f"episode/{bot_name}/reward"
+        self._ep_logs_keys[i] = f"episode/{bot_name}/logs_collected"
+        self._ep_avg_keys[i] = f"episode/{bot_name}/avg_reward_10"
+    
+    def _record_info(self, i, info):
+        """
+        Update logs collected and bot name of one environment from its step info
+        
+        Args:
+            i (int): Environment index
+            info (dict): Info dict returned by the environment
+        """
+        # Get logs collected if available
+        if 'logs_collected' in info:
+            self.logs_collected[i] = info['logs_collected']
+            
+            # Record bot ID for logging
+            if 'bot_id' in info and info['bot_id'] != self.bot_ids[i]:
+                self._set_bot_name(i, info['bot_id'])
     
     def _on_step(self) -> bool:
         """
@@ -39,60 +105,114 @@ class ParallelLoggingCallback(BaseCallback):
         Returns:
             bool: Whether training should continue
         """
-        # Update rewards for each environment
-        for i, reward in enumerate(self.locals['rewards']):
-            self.current_episode_rewards[i] += reward
+        rewards = np.asarray(self.locals['rewards'])
+        dones = np.asarray(self.locals['dones'])
+        
+        done_idx = np.flatnonzero(dones)
+        log_step = self.num_timesteps % 20 == 0
+        
+        # Update rewards for all environments at once
+        self.current_episode_rewards += rewards
+        
+        # Info values are only read on logging steps and for envs whose episode ended
+        infos = self.locals.get('infos', ())
+        
+        # Metrics are buffered and sent together by _flush
+        payload = self._pending
+        
+        # Log aggregates to W&B every 20 steps
+        if log_step:
+            for i, info in enumerate(infos):
+                self._record_info(i, info)
+            
+            # Aggregate statistics, as plain Python numbers so W&B skips its NumPy conversions
+            payload["train/total_logs_collected"] = float(self.logs_collected.sum())
+            payload["train/avg_episode_reward"] = float(self.current_episode_rewards.mean())
+            payload["train/timestep"] = self.num_timesteps
+            
+            # Individual bot statistics, converted in bulk
+            payload.update(zip(self._reward_keys, self.current_episode_rewards.tolist()))
+            payload.update(zip(self._logs_keys, self.logs_collected.tolist()))
+        
+        # Handle only the environments whose episode ended (usually none)
+        for i in done_idx:
+            # Logging steps already read every info above
+            if not log_step:
+                self._record_info(i, infos[i])
+            
+            # Record episode stats, dropping the oldest reward from the running sum once full
+            episode_reward = float(self.current_episode_rewards[i])
+            if len(self.episode_rewards) == self.episode_rewards.maxlen:
+                self._recent_sum -= self.episode_rewards[0]
+            self.episode_rewards.append(episode_reward)
+            self._recent_sum += episode_reward
             
-            # Get logs collected if available
-            if 'infos' in self.locals and len(self.locals['infos']) > i:
-                if 'logs_collected' in self.locals['infos'][i]:
-                    self.logs_collected[i] = self.locals['infos'][i]['logs_collected']
-                    
-                    # Record bot ID for logging
-                    if 'bot_id' in self.locals['infos'][i]:
-                        bot_id = self.locals['infos'][i]['bot_id']
-                        self.bot_logs[i] = f"Bot-{bot_id}"
-        
-        # Log to W&B every 20 steps
-        if self.num_timesteps % 20 == 0:
-            # Log aggregate statistics
-            wandb.log({
-                "train/total_logs_collected": np.sum(self.logs_collected),
-                "train/avg_episode_reward": np.mean(self.current_episode_rewards),
-                "train/timestep": self.num_timesteps
-            }, step=self.num_timesteps)
+            # Calculate average reward over the last 10 episodes
+            avg_reward = self._recent_sum / len(self.episode_rewards)
             
-            # Log individual bot statistics
-            for i in range(len(self.current_episode_rewards)):
-                bot_name = self.bot_logs[i] if self.bot_logs[i] else f"Bot-{i}"
-                wandb.log({
-                    f"{bot_name}/reward": self.current_episode_rewards[i],
-                    f"{bot_name}/logs_collected": self.logs_collected[i]
-                }, step=self.num_timesteps)
-        
-        # Check for episode end in each environment
-        for i, done in enumerate(self.locals['dones']):
-            if done:
-                # Record episode stats
-                self.episode_rewards.append(self.current_episode_rewards[i])
-                
-                # Calculate average reward
-                avg_reward = np.mean(self.episode_rewards[-10:]) if len(self.episode_rewards) >= 10 else np.mean(self.episode_rewards)
-                
-                # Log bot-specific episode completion
-                bot_name = self.bot_logs[i] if self.bot_logs[i] else f"Bot-{i}"
-                wandb.log({
-                    f"episode/{bot_name}/reward": self.current_episode_rewards[i],
-                    f"episode/{bot_name}/logs_collected": self.logs_collected[i],
-                    f"episode/{bot_name}/avg_reward_10": avg_reward
-                }, step=self.num_timesteps)
-                
-                # Print episode summary
-                print(f"Episode complete for {bot_name}")
-                print(f"  Reward: {self.current_episode_rewards[i]:.2f}")
-                print(f"  Logs Collected: {self.logs_collected[i]}")
-                
-                # Reset this environment's episode tracking
-                self.current_episode_rewards[i] = 0
-        
-        return True
\ No newline at end of file
+            # Record bot-specific episode completion
+            payload[self._ep_reward_keys[i]] = episode_reward
+            payload[self._ep_logs_keys[i]] = float(self.logs_collected[i])
+            payload[self._ep_avg_keys[i]] = avg_reward
+            
+            # Print episode summary
+            print(f"Episode complete for {self.bot_logs[i]}")
+            print(f"  Reward: {self.current_episode_rewards[i]:.2f}")
+            print(f"  Logs Collected: {self.logs_collected[i]}")
+        
+        # Reset episode tracking of finished environments
+        self.current_episode_rewards[done_idx] = 0
+        
+        # Send the buffer when an episode ended or every flush_freq timesteps
+        if done_idx.size or self.num_timesteps - self._last_flush >= self.flush_freq:
+            self._flush()
+        
+        return True
+    
+    def _on_training_end(self) -> None:
+        """Send any metrics still buffered and wait for the logging thread to finish"""
+        self.close()
+    
+    def close(self, timeout=30.0):
+        """
+        Flush buffered metrics and stop the logging thread (safe to call more than once)
+        
+        Also called by the training script when learn() raises, since SB3 then
+        skips _on_training_end.
+        
+        Args:
+            timeout (float): Seconds to wait for queued metrics to be sent
+        """
+        self._flush()
+        if self._log_thread is None:
+            return
+        try:
+            self._log_queue.put(None, timeout=timeout)
+        except queue.Full:
+            logger.warning("W&B logging thread is not draining, dropping queued metrics")
+        self._log_thread.join(timeout)
+        self._log_thread = None
+    
+    def _flush(self):
+        """Hand the buffered metrics to the logging thread and start a new buffer"""
+        if self._pending:
+            try:
+                self._log_queue.put_nowait((self.num_timesteps, self._pending))
+            except queue.Full:
+                # W&B is falling behind, drop this window rather than stall training
+                pass
+            self._pending = {}
+        self._last_flush = self.num_timesteps
+    
+    def _drain_log_queue(self):
+        """Log queued metrics to W&B until the None sentinel is received"""
+        while True:
+            item = self._log_queue.get()
+            if item is None:
+                break
+            step, payload = item
+            try:
+                wandb.log(payload, step=step)
+            except Exception as e:
+                # Keep draining, one failed call must not stop all later logging
+                logger.error(f"W&B logging failed at step {step}: {e}")
\ No newline at end of file
@@ -1,56 +1,198 @@
 """
 MinecraftBridge - Communication bridge between Python and JavaScript Mineflayer bots
-Handles ZeroMQ messaging and provides an interface for the reinforcement learning agent
+Handles ZeroMQ messaging (MessagePack encoded) and provides an interface for the reinforcement learning agent
 """
 
+import os
 import zmq
 import time
-import json
-from typing import Dict, Any
+import atexit
+import logging
+import msgpack
+import numpy as np
+from typing import Dict, Any, List
 
-class MinecraftBridge:
-    """Bridge between Python and JavaScript Mineflayer bot using ZeroMQ"""
-    def __init__(self, host="127.0.0.1", port=5555, timeout=60000, bot_id=0):
+# Layout of the flat state array sent by the JavaScript bridge
+STATE_SIZE = 11
+(STATE_X, STATE_Y, STATE_Z, STATE_YAW, STATE_PITCH, STATE_INVENTORY_LOGS, STATE_TREE_VISIBLE,
+ STATE_LOG_DISTANCE, STATE_LOG_X, STATE_LOG_Z, STATE_HAS_LOG) = range(STATE_SIZE)
+
+# States arrive as one binary blob of STATE_SIZE little-endian float64 values
+STATE_DTYPE = np.dtype("<f8")
+
+# State reported when the bot cannot be reached: origin, no logs, no tree in sight
+DEFAULT_STATE = np.zeros(STATE_SIZE, dtype=STATE_DTYPE)
+
+# Hosts on which the ipc transport can reach the JavaScript bridge
+LOCAL_HOSTS = ("127.0.0.1", "localhost", "::1")
+
+def bridge_endpoint(host, port, transport="tcp"):
+    """
+    Build the ZeroMQ endpoint of a bridge port
+    
+    The ipc transport (a Unix domain socket named after the port, bound by the
+    JavaScript bridge started with --transport ipc) skips the TCP loopback stack.
+    It only works on the same machine, so it is refused for any other host.
+    
+    Args:
+        host (str): Host where the JavaScript bridge is running
+        port (int): Port for ZMQ communication
+        transport (str): "tcp" or "ipc"
+        
+    Returns:
+        str: Endpoint to connect to
+        
+    Raises:
+        ValueError: If transport is "ipc" and host is not a local host
+    """
+    if transport == "ipc":
+        if host not in LOCAL_HOSTS:
+            raise ValueError(f"ipc transport needs the bridge on this machine, got host {host}")
+        return f"ipc:///tmp/mineflayer-{port}"
+    return f"tcp://{host}:{port}"
+
+def decode_state(payload) -> np.ndarray:
+    """
+    View a binary state sent by the JavaScript bridge as an array, without copying
+    
+    Args:
+        payload (bytes): STATE_SIZE packed float64 values
+        
+    Returns:
+        np.ndarray: Read-only state laid out as the STATE_* indices
+    """
+    return np.frombuffer(payload, dtype=STATE_DTYPE, count=STATE_SIZE)
+
+class BaseMinecraftBridge:
+    """
+    ZeroMQ connection to the JavaScript bridge shared by the per-bot and batch bridges
+    
+    Owns the socket and its poller, sends requests, matches replies to them and
+    turns step replies into step results. The request types are left to the
+    subclasses.
+    """
+    # ZeroMQ context shared by every bridge in this process
+    context = None
+
+    def __init__(self, host="127.0.0.1", port=5555, timeout=60000, bot_id=0, transport="tcp"):
         """
-        Initialize the bridge
+        Initialize the connection
         
         Args:
             host (str): Host where the JavaScript bridge is running
             port (int): Port for ZMQ communication
             timeout (int): Socket timeout in milliseconds
-            bot_id (int): Unique identifier for this bot
+            bot_id (int): Identifier used in log messages
+            transport (str): "tcp", or "ipc" for a bridge on the same machine
         """
         self.bot_id = bot_id
+        # Logged through the "bridge" logger, configured by setup_bridge_logging in utils
+        self.log = logging.getLogger(f"bridge.{bot_id}")
         self.host = host
         self.port = port
+        self.endpoint = bridge_endpoint(host, port, transport)
         self.timeout = timeout
+        self.socket = None
+        self.request_id = 0
+        # Reused for every request instead of building a packer per message
+        self._packer = msgpack.Packer(use_bin_type=True)
         self.reconnect()
     
+    @classmethod
+    def get_context(cls):
+        """
+        Return the process-wide ZeroMQ context, creating it on first use
+        
+        One context serves all bridges of the process, with its I/O threads
+        scaled to the machine instead of one thread pool per bot.
+        """
+        if BaseMinecraftBridge.context is None:
+            BaseMinecraftBridge.context = zmq.Context(io_threads=max(1, (os.cpu_count() or 2) // 2))
+            atexit.register(BaseMinecraftBridge.destroy_context)
+        return BaseMinecraftBridge.context
+    
+    @classmethod
+    def destroy_context(cls):
+        """Close any remaining sockets and terminate the shared context"""
+        if BaseMinecraftBridge.context is not None:
+            BaseMinecraftBridge.context.destroy(linger=0)
+            BaseMinecraftBridge.context = None
+    
     def reconnect(self):
         """Create a fresh socket connection"""
         # Close existing connection if any
-        if hasattr(self, 'socket') and self.socket:
+        if self.socket:
             try:
                 self.socket.close()
             except:
                 pass
-        if hasattr(self, 'context') and self.context:
-            try:
-                self.context.term()
-            except:
-                pass
                 
-        # Initialize ZeroMQ connection
-        self.context = zmq.Context()
-        self.socket = self.context.socket(zmq.REQ)
-        self.socket.connect(f"tcp://{self.host}:{self.port}")
-        self.socket.setsockopt(zmq.RCVTIMEO, self.timeout)
+        # DEALER socket so requests are not locked to strict send/recv alternation;
+        # replies are matched to requests by their "id" field instead
+        self.socket = self.get_context().socket(zmq.DEALER)
         self.socket.setsockopt(zmq.LINGER, 0)  # Don't wait on close
-        self.print_log(f"Connected to JavaScript bridge at {self.host}:{self.port}")
+        # ZeroMQ already disables Nagle on TCP. At most one request is in flight,
+        # so keep the queues at one message and only queue on a live connection;
+        # a send then fails after the timeout instead of sitting in a buffer.
+        self.socket.setsockopt(zmq.IMMEDIATE, 1)
+        self.socket.setsockopt(zmq.SNDHWM, 1)
+        self.socket.setsockopt(zmq.RCVHWM, 1)
+        self.socket.setsockopt(zmq.SNDTIMEO, self.timeout)
+        self.socket.setsockopt(zmq.CONNECT_TIMEOUT, self.timeout)
+        self.socket.setsockopt(zmq.TCP_KEEPALIVE, 1)
+        self.socket.connect(self.endpoint)
+        self.poller = zmq.Poller()
+        self.poller.register(self.socket, zmq.POLLIN)
+        self.log.info(f"Connected to JavaScript bridge at {self.endpoint}")
+        
+    def send_request(self, request_data):
+        """
+        Send a request without waiting for the reply
+        
+        Args:
+            request_data (dict): Request data to send
+            
+        Returns:
+            int: Correlation id to pass to recv_response
+        """
+        self.request_id += 1
+        request_data["id"] = self.request_id
+        self.socket.send_multipart([b"", self._packer.pack(request_data)], copy=False)
+        return self.request_id
+    
+    def recv_message(self):
+        """
+        Receive the next reply available on the socket
+        
+        Returns:
+            dict: Decoded reply
+        """
+        _, payload = self.socket.recv_multipart(copy=False)
+        return msgpack.unpackb(payload, raw=False)
+    
+    def recv_response(self, request_id):
+        """
+        Wait for the reply to a request sent with send_request
         
-    def print_log(self, message):
-        """Helper to log messages with bot ID prefix"""
-        print(f"[Bot-{self.bot_id}] {message}")
+        Replies to earlier, timed out requests are discarded.
+        
+        Args:
+            request_id (int): Correlation id returned by send_request
+            
+        Returns:
+            dict: Response from the JavaScript bridge
+            
+        Raises:
+            zmq.error.Again: If no matching reply arrives within the timeout
+        """
+        deadline = time.monotonic() + self.timeout / 1000.0
+        while True:
+            remaining = int((deadline - time.monotonic()) * 1000)
+            if remaining <= 0 or not self.poller.poll(remaining):
+                raise zmq.error.Again()
+            response = self.recv_message()
+            if response.get("id") == request_id:
+                return response
     
     def safe_request(self, request_data, max_retries=2):
         """
@@ -65,43 +207,96 @@ class MinecraftBridge:
         """
         for attempt in range(max_retries):
             try:
-                self.socket.send_json(request_data)
-                response = self.socket.recv_json()
-                return response
+                request_id = self.send_request(request_data)
+                return self.recv_response(request_id)
             except zmq.error.Again:
-                self.print_log(f"Timeout on attempt {attempt+1}/{max_retries}")
+                self.log.warning(f"Timeout on attempt {attempt+1}/{max_retries}")
                 # Only reconnect if it's not our last attempt
                 if attempt < max_retries - 1:
-                    self.print_log("Reconnecting...")
+                    self.log.info("Reconnecting...")
                     time.sleep(1)
                     self.reconnect()
             except zmq.error.ZMQError as e:
-                self.print_log(f"ZMQ error: {e}. Reconnecting...")
+                self.log.warning(f"ZMQ error: {e}. Reconnecting...")
                 time.sleep(1)
                 self.reconnect()
                 
-        self.print_log("All retries failed")
+        self.log.error("All retries failed")
         return {"status": "error", "message": "All retries failed"}
     
-    def get_state(self) -> Dict[str, Any]:
+    def step_result(self, response, last_state, source="") -> Dict[str, Any]:
         """
-        Get current state from the JavaScript bot
+        Turn the reply of one bot into a step result
         
+        Args:
+            response (dict): Reply or batch result of the bot
+            last_state (np.ndarray): State returned if the request failed
+            source (str): Bot named in the error message, empty for a per-bot bridge
+            
         Returns:
-            dict: Current state of the bot
+            dict: Result containing reward, next state, and done flag ("error" is set if the request failed)
         """
-        response = self.safe_request({"type": "get_state"})
         if response["status"] != "ok":
-            # Return a default empty state on error
-            self.print_log(f"Error getting state: {response.get('message', 'Unknown error')}")
+            self.log.error(f"Error taking action{source}: {response.get('message', 'Unknown error')}")
+            # Not a real episode end: flag the error and let the env truncate
             return {
-                "position": {"x": 0, "y": 0, "z": 0},
-                "yaw": 0, "pitch": 0,
-                "inventory_logs": 0,
-                "tree_visible": False,
-                "closest_log": None
+                "reward": 0.0,
+                "next_state": last_state,
+                "done": False,
+                "error": True
             }
-        return response["state"]
+        return {
+            "reward": response["reward"],
+            "next_state": decode_state(response["next_state"]),
+            "done": response["done"]
+        }
+    
+    def close(self):
+        """Close the ZeroMQ connection"""
+        try:
+            # Send close message to JavaScript side
+            try:
+                self.safe_request({"type": "close"})
+            except:
+                pass  # It's ok if this fails
+            
+            # The context is shared with the other bridges, only the socket is ours
+            self.socket.close()
+            self.log.info("Connection closed")
+        except Exception as e:
+            self.log.error(f"Error closing connection: {e}")
+
+class MinecraftBridge(BaseMinecraftBridge):
+    """Bridge between Python and JavaScript Mineflayer bot using ZeroMQ"""
+    def __init__(self, host="127.0.0.1", port=5555, timeout=60000, bot_id=0, transport="tcp"):
+        """
+        Initialize the bridge
+        
+        Args:
+            host (str): Host where the JavaScript bridge is running
+            port (int): Port for ZMQ communication
+            timeout (int): Socket timeout in milliseconds
+            bot_id (int): Unique identifier for this bot
+            transport (str): "tcp", or "ipc" for a bridge on the same machine
+        """
+        # Last state received from the bot, returned when a request fails
+        self._last_state = DEFAULT_STATE
+        super(MinecraftBridge, self).__init__(host=host, port=port, timeout=timeout, bot_id=bot_id, transport=transport)
+    
+    def get_state(self) -> np.ndarray:
+        """
+        Get current state from the JavaScript bot
+        
+        Returns:
+            np.ndarray: Current state of the bot, laid out as the STATE_* indices
+        """
+        response = self.safe_request({"type": "get_state"})
+        if response["status"] != "ok":
+            # Return the last known state on error
+            self.log.error(f"Error getting state: {response.get('message', 'Unknown error')}")
+            return self._last_state
+        self._last_state = decode_state(response["state"])
+        return self._last_state
     
     def take_action(self, action: int) -> Dict[str, Any]:
         """
@@ -114,18 +309,21 @@ class MinecraftBridge:
             dict: Result containing reward, next state, and done flag
         """
         response = self.safe_request({"type": "take_action", "action": int(action)})
-        if response["status"] != "ok":
-            self.print_log(f"Error taking action: {response.get('message', 'Unknown error')}")
-            return {
-                "reward": -1.0,
-                "next_state": self.get_state(),
-                "done": True
-            }
-        return {
-            "reward": response["reward"],
-            "next_state": response["next_state"],
-            "done": response["done"]
-        }
+        return self.action_result(response)
+    
+    def action_result(self, response) -> Dict[str, Any]:
+        """
+        Turn the reply to a take_action request into a step result
+        
+        Args:
+            response (dict): Reply from the JavaScript bridge
+            
+        Returns:
+            dict: Result containing reward, next state, and done flag ("error" is set if the request failed)
+        """
+        result = self.step_result(response, self._last_state)
+        self._last_state = result["next_state"]
+        return result
     
     def batch_actions(self, actions):
         """
@@ -145,54 +343,144 @@ class MinecraftBridge:
         response = self.safe_request(request_data)
         
         if response["status"] != "ok":
-            self.print_log(f"Error in batch actions: {response.get('message', 'Unknown error')}")
+            self.log.error(f"Error in batch actions: {response.get('message', 'Unknown error')}")
             return {
-                "rewards": [-0.1] * len(actions),
-                "next_state": self.get_state(),
-                "done": True
+                "rewards": [0.0] * len(actions),
+                "next_state": self._last_state,
+                "done": False,
+                "error": True
             }
         
+        self._last_state = decode_state(response["next_state"])
         return {
             "rewards": response["rewards"],
-            "next_state": response["next_state"],
+            "next_state": self._last_state,
             "done": response["done"]
         }
         
-    def reset(self) -> Dict[str, Any]:
+    def reset(self) -> np.ndarray:
         """
         Reset environment in the JavaScript bot
         
         Returns:
-            dict: Initial state after reset
+            np.ndarray: Initial state after reset, laid out as the STATE_* indices
         """
         response = self.safe_request({"type": "reset"})
+        return self.reset_result(response)
+    
+    def reset_result(self, response) -> np.ndarray:
+        """
+        Turn the reply to a reset request into the initial state
+        
+        Args:
+            response (dict): Reply from the JavaScript bridge
+            
+        Returns:
+            np.ndarray: Initial state after reset, laid out as the STATE_* indices
+        """
         if response["status"] != "ok":
-            self.print_log(f"Error resetting: {response.get('message', 'Unknown error')}")
-            # Try to get state anyway
-            try:
-                return self.get_state()
-            except:
-                # Return default state if all else fails
-                return {
-                    "position": {"x": 0, "y": 0, "z": 0},
-                    "yaw": 0, "pitch": 0, 
-                    "inventory_logs": 0,
-                    "tree_visible": False,
-                    "closest_log": None
-                }
-        return response["state"]
+            self.log.error(f"Error resetting: {response.get('message', 'Unknown error')}")
+            # Return the last known state rather than issuing another request
+            return self._last_state
+        self._last_state = decode_state(response["state"])
+        return self._last_state
     
-    def close(self):
-        """Close the ZeroMQ connection"""
+class MinecraftVecBridge(BaseMinecraftBridge):
+    """
+    Bridge stepping every bot through the server's batch endpoint
+    
+    One request carries the actions of all bots and one reply returns all of
+    their results, so a vectorized step costs a single round-trip instead of
+    one per bot. Bot i is the bot the server runs as bot_i.
+    """
+    def __init__(self, num_bots, host="127.0.0.1", port=5554, timeout=60000, transport="tcp"):
+        """
+        Initialize the bridge
+        
+        Args:
+            num_bots (int): Number of bots stepped together
+            host (str): Host where the JavaScript bridge is running
+            port (int): Port of the batch endpoint (vec-port on the JavaScript side)
+            timeout (int): Time to wait for all bots to reply in milliseconds
+            transport (str): "tcp", or "ipc" for a bridge on the same machine
+        """
+        self.num_bots = num_bots
+        # Last state received from each bot, returned when its request fails
+        self._last_states = [DEFAULT_STATE] * num_bots
+        super(MinecraftVecBridge, self).__init__(host=host, port=port, timeout=timeout, bot_id="vec", transport=transport)
+    
+    def send_step(self, actions):
+        """
+        Send one action per bot without waiting for the results
+        
+        Args:
+            actions (list): Action index for each bot
+            
+        Returns:
+            int: Correlation id to pass to recv_step, None if the send timed out
+        """
         try:
-            # Send close message to JavaScript side
+            return self.send_request({"type": "batch_step", "actions": [int(action) for action in actions]})
+        except zmq.error.Again:
+            return None
+    
+    def recv_step(self, request_id) -> List[Dict[str, Any]]:
+        """
+        Wait for the results of a step sent with send_step
+        
+        Args:
+            request_id (int): Correlation id returned by send_step
+            
+        Returns:
+            list: Step result of each bot, in the format of BaseMinecraftBridge.step_result
+        """
+        response = {"status": "error", "message": "Timed out waiting for reply"}
+        if request_id is not None:
             try:
-                self.safe_request({"type": "close"})
-            except:
-                pass  # It's ok if this fails
+                response = self.recv_response(request_id)
+            except zmq.error.Again:
+                pass
+        
+        if response["status"] != "ok":
+            results = [response] * self.num_bots
+        else:
+            results = response["results"]
+        return [self._action_result(i, result) for i, result in enumerate(results)]
+    
+    def _action_result(self, i, response) -> Dict[str, Any]:
+        """
+        Turn the result of one bot into a step result
+        
+        Args:
+            i (int): Bot index
+            response (dict): Result of the bot from the batch reply
             
-            self.socket.close()
-            self.context.term()
-            self.print_log("Connection closed")
-        except Exception as e:
-            self.print_log(f"Error closing connection: {e}")
\ No newline at end of file
+        Returns:
+            dict: Result containing reward, next state, and done flag ("error" is set if the request failed)
+        """
+        result = self.step_result(response, self._last_states[i], f" for bot {i}")
+        self._last_states[i] = result["next_state"]
+        return result
+    
+    def reset_bots(self, indices) -> List[np.ndarray]:
+        """
+        Reset the given bots concurrently
+        
+        Args:
+            indices (list): Indices of the bots to reset
+            
+        Returns:
+            list: Initial state of each bot, the last known state if its reset failed
+        """
+        indices = [int(i) for i in indices]
+        response = self.safe_request({"type": "batch_reset", "bots": indices})
+        if response["status"] != "ok":
+            self.log.error(f"Error resetting: {response.get('message', 'Unknown error')}")
+            return [self._last_states[i] for i in indices]
+        
+        for i, result in zip(indices, response["results"]):
+            if result["status"] == "ok":
+                self._last_states[i] = decode_state(result["state"])
+            else:
+                self.log.error(f"Error resetting bot {i}: {result.get('message', 'Unknown error')}")
+        return [self._last_states[i] for i in indices]
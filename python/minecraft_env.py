@@ -3,20 +3,116 @@ MinecraftEnv - Gymnasium environment for controlling Minecraft bots
 Translates bot states and actions into RL-compatible format
 """
 
+import math
 import numpy as np
 import gymnasium as gym
 from gymnasium import spaces
 from typing import Dict, Any, Tuple, List, Optional
 
-from minecraft_bridge import MinecraftBridge
+try:
+    from numba import njit
+except ImportError:
+    # Numba is optional, fall back to running the kernel as plain Python
+    def njit(*args, **kwargs):
+        return lambda func: func
+
+from minecraft_bridge import (
+    MinecraftBridge, STATE_X, STATE_Y, STATE_Z, STATE_YAW, STATE_PITCH, STATE_INVENTORY_LOGS,
+    STATE_TREE_VISIBLE, STATE_LOG_DISTANCE, STATE_LOG_X, STATE_LOG_Z, STATE_HAS_LOG, STATE_SIZE
+)
+
+# Number of features in the observation vector
+OBS_SIZE = 11
+
+# Observation bounds, see make_spaces for the feature order
+_OBS_LOW = np.array([-1.0]*6 + [0.0]*3 + [-1.0]*2, dtype=np.float32)
+_OBS_HIGH = np.ones(OBS_SIZE, dtype=np.float32)
+
+# Normalization factors used by _normalize
+POS_SCALE = 1 / 100.0
+COUNT_SCALE = 1 / 10.0
+PITCH_SCALE = 1 / math.pi
+
+# Explicit signatures compile the kernels at import (or load them from the on-disk
+# cache) instead of stalling the first training step; ::1 marks contiguous arrays
+@njit("void(float64[::1], float32[::1])", cache=True, fastmath=True)
+def _normalize(raw, out):
+    """
+    Normalize a raw state array from the JavaScript bridge into an observation
+    
+    Args:
+        raw (np.ndarray): float64 state laid out as the STATE_* indices
+        out (np.ndarray): float32 observation buffer to fill in place
+    """
+    x = raw[STATE_X]
+    z = raw[STATE_Z]
+    
+    # Bot position
+    out[0] = x * POS_SCALE
+    out[1] = raw[STATE_Y] * POS_SCALE
+    out[2] = z * POS_SCALE
+    
+    # Orientation
+    out[3] = math.sin(raw[STATE_YAW])
+    out[4] = math.cos(raw[STATE_YAW])
+    out[5] = raw[STATE_PITCH] * PITCH_SCALE
+    
+    # Tree visibility and logs
+    out[6] = raw[STATE_TREE_VISIBLE]
+    out[7] = raw[STATE_INVENTORY_LOGS] * COUNT_SCALE
+    
+    # Distance and direction to log
+    if raw[STATE_HAS_LOG] > 0:
+        out[8] = min(raw[STATE_LOG_DISTANCE] * COUNT_SCALE, 1.0)
+        dx = raw[STATE_LOG_X] - x
+        dz = raw[STATE_LOG_Z] - z
+        length = math.hypot(dx, dz)
+        inv_length = 1.0 / length if length > 0 else 0.0
+        out[9] = dx * inv_length
+        out[10] = dz * inv_length
+    else:
+        # Max distance, no direction
+        out[8] = 1.0
+        out[9] = 0.0
+        out[10] = 0.0
+
+@njit("void(float64[:, ::1], float32[:, ::1])", cache=True, fastmath=True)
+def _normalize_batch(raw, out):
+    """
+    Normalize the raw states of several bots in a single call
+    
+    Args:
+        raw (np.ndarray): float64 states of shape (N, STATE_SIZE)
+        out (np.ndarray): float32 observations of shape (N, OBS_SIZE) to fill in place
+    """
+    for i in range(raw.shape[0]):
+        _normalize(raw[i], out[i])
+
+def make_spaces() -> Tuple[spaces.Box, spaces.Discrete]:
+    """
+    Create the observation and action spaces shared by all Minecraft environments
+    
+    Returns:
+        tuple: (observation_space, action_space)
+    """
+    # Actions: move_forward, turn_left, turn_right, jump, break_block
+    action_space = spaces.Discrete(5)
+    
+    # State space is continuous with 11 dimensions
+    # [pos_x, pos_y, pos_z, sin_yaw, cos_yaw, pitch, tree_visible, 
+    #  inventory_logs, distance_to_log, dir_x, dir_z]
+    observation_space = spaces.Box(low=_OBS_LOW, high=_OBS_HIGH, dtype=np.float32)
+    return observation_space, action_space
 
 class MinecraftEnv(gym.Env):
     """
     Custom Gym environment that interfaces with Mineflayer bot via ZeroMQ bridge
     """
     metadata = {'render.modes': ['human']}
+    # Nothing to close until the bridge has been created
+    _closed = True
     
-    def __init__(self, bridge_host="127.0.0.1", bridge_port=5555, bot_id=0):
+    def __init__(self, bridge_host="127.0.0.1", bridge_port=5555, bot_id=0, transport="tcp"):
         """
         Initialize the environment
         
@@ -24,89 +120,53 @@ class MinecraftEnv(gym.Env):
             bridge_host (str): Host where the JavaScript bridge is running
             bridge_port (int): Port for ZMQ communication
             bot_id (int): Unique identifier for this bot
+            transport (str): ZeroMQ transport, "tcp" or "ipc"
         """
         super(MinecraftEnv, self).__init__()
         
         self.bot_id = bot_id
         # Initialize connection to Minecraft bot
-        self.bridge = MinecraftBridge(host=bridge_host, port=bridge_port, bot_id=bot_id)
+        self.bridge = MinecraftBridge(host=bridge_host, port=bridge_port, bot_id=bot_id, transport=transport)
+        self._closed = False
         
         # Define action and observation space
-        # Actions: move_forward, turn_left, turn_right, jump, break_block
-        self.action_space = spaces.Discrete(5)
-        
-        # State space is continuous with 11 dimensions
-        # [pos_x, pos_y, pos_z, sin_yaw, cos_yaw, pitch, tree_visible, 
-        #  inventory_logs, distance_to_log, dir_x, dir_z]
-        self.observation_space = spaces.Box(
-            low=np.array([-1.0, -1.0, -1.0, -1.0, -1.0, -1.0, 0.0, 0.0, 0.0, -1.0, -1.0]),
-            high=np.array([1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0]),
-            dtype=np.float32
-        )
+        self.observation_space, self.action_space = make_spaces()
+        # Plain int copy of the action count for the per-step check
+        self._n_actions = int(self.action_space.n)
         
         # Initialize state
         self.current_state = None
         self.steps = 0
         self.max_steps = 100  # Maximum steps per episode
         self.total_logs_collected = 0
+        
+        # Raw state and observation buffers filled in place by process_state
+        self._raw_buf = np.zeros(STATE_SIZE, dtype=np.float64)
+        self._state_buf = np.zeros(OBS_SIZE, dtype=np.float32)
+        # Placeholder observation returned on terminal steps
+        self._zero_obs = np.zeros(OBS_SIZE, dtype=np.float32)
     
     def print_log(self, message):
         """Helper to log messages with bot ID prefix"""
         print(f"[Bot-{self.bot_id}] {message}")
     
-    def process_state(self, state_dict: Dict[str, Any]) -> np.ndarray:
+    def process_state(self, state: np.ndarray) -> np.ndarray:
         """
-        Convert state dictionary from JavaScript to normalized state vector
+        Convert flat state array from JavaScript to normalized state vector
+        
+        The raw and normalized buffers are reused, but the returned array is a
+        copy: DummyVecEnv keeps the terminal observation in info after the
+        following reset.
         
         Args:
-            state_dict (dict): State dictionary from the JavaScript bridge
+            state (np.ndarray): State array from the JavaScript bridge
             
         Returns:
             np.ndarray: Normalized state vector for the RL agent
         """
-        # Initialize with zeros
-        state_vector = np.zeros(11, dtype=np.float32)
-        
-        # Bot position
-        if 'position' in state_dict:
-            pos = state_dict['position']
-            state_vector[0:3] = [
-                pos['x']/100.0,  # Normalize positions
-                pos['y']/100.0,
-                pos['z']/100.0
-            ]
-        
-        # Orientation
-        if 'yaw' in state_dict and 'pitch' in state_dict:
-            state_vector[3:6] = [
-                np.sin(state_dict['yaw']), 
-                np.cos(state_dict['yaw']),
-                state_dict['pitch'] / np.pi
-            ]
-        
-        # Tree visibility and logs
-        state_vector[6] = 1.0 if state_dict.get('tree_visible', False) else 0.0
-        state_vector[7] = state_dict.get('inventory_logs', 0) / 10.0  # Normalize
-        
-        # Distance and direction to log
-        closest_log = state_dict.get('closest_log', None)
-        if closest_log:
-            distance = min(closest_log['distance'] / 10.0, 1.0)  # Normalize
-            
-            # Direction vector to log (if available)
-            dx = closest_log['x'] - state_dict['position']['x']
-            dz = closest_log['z'] - state_dict['position']['z']
-            length = np.sqrt(dx*dx + dz*dz)
-            
-            if length > 0:
-                dx /= length
-                dz /= length
-            
-            state_vector[8:11] = [distance, dx, dz]
-        else:
-            state_vector[8:11] = [1.0, 0.0, 0.0]  # Max distance, no direction
-        
-        return state_vector
+        self._raw_buf[:] = state
+        _normalize(self._raw_buf, self._state_buf)
+        return self._state_buf.copy()
     
     def step(self, action: int) -> Tuple[np.ndarray, float, bool, bool, Dict[str, Any]]:
         """
@@ -118,18 +178,19 @@ class MinecraftEnv(gym.Env):
         Returns:
             tuple: (next_state, reward, terminated, truncated, info)
         """
-        # Check if action is valid
-        assert self.action_space.contains(action), f"Invalid action {action}"
+        # Check if action is valid (plain int comparison, Discrete.contains is slow per step;
+        # skipped entirely under python -O)
+        action = int(action)
+        if __debug__ and not 0 <= action < self._n_actions:
+            raise ValueError(f"Invalid action {action}")
         
         # Execute action in JS environment
         result = self.bridge.take_action(action)
         reward = result["reward"]
-        next_state_dict = result["next_state"]
+        next_state = result["next_state"]
         done = result["done"]
         
-        # Process state
-        next_state_vector = self.process_state(next_state_dict)
-        self.current_state = next_state_dict
+        self.current_state = next_state
         
         # Increment step counter
         self.steps += 1
@@ -139,7 +200,7 @@ class MinecraftEnv(gym.Env):
         terminated = done
         
         # Track logs collected
-        current_logs = self.current_state.get("inventory_logs", 0)
+        current_logs = int(self.current_state[STATE_INVENTORY_LOGS])
         if current_logs > self.total_logs_collected:
             self.total_logs_collected = current_logs
         
@@ -150,6 +211,19 @@ class MinecraftEnv(gym.Env):
             "bot_id": self.bot_id
         }
         
+        # A failed request is not a real episode end, truncate so the value is bootstrapped
+        if result.get("error"):
+            truncated = True
+            terminated = False
+            info["bridge_error"] = True
+        
+        # The terminal observation is only used to bootstrap truncated episodes,
+        # so skip normalizing it when the episode really ended
+        if terminated and not truncated:
+            next_state_vector = self._zero_obs
+        else:
+            next_state_vector = self.process_state(next_state)
+        
         return next_state_vector, reward, terminated, truncated, info
         
     def step_batch(self, actions: List[int]) -> Tuple[np.ndarray, float, bool, bool, Dict[str, Any]]:
@@ -163,8 +237,11 @@ class MinecraftEnv(gym.Env):
             tuple: (final_observation, total_reward, terminated, truncated, info)
         """
         # Validate actions
-        for action in actions:
-            assert self.action_space.contains(action), f"Invalid action {action}"
+        actions = [int(action) for action in actions]
+        if __debug__:
+            for action in actions:
+                if not 0 <= action < self._n_actions:
+                    raise ValueError(f"Invalid action {action}")
         
         # Execute batch of actions
         result = self.bridge.batch_actions(actions)
@@ -184,7 +261,7 @@ class MinecraftEnv(gym.Env):
         terminated = result["done"]
         
         # Track logs collected
-        current_logs = self.current_state.get("inventory_logs", 0)
+        current_logs = int(self.current_state[STATE_INVENTORY_LOGS])
         if current_logs > self.total_logs_collected:
             self.total_logs_collected = current_logs
         
@@ -197,6 +274,11 @@ class MinecraftEnv(gym.Env):
             "actions_taken": len(result["rewards"])
         }
         
+        if result.get("error"):
+            truncated = True
+            terminated = False
+            info["bridge_error"] = True
+        
         return next_state_vector, total_reward, terminated, truncated, info
     
     def reset(self, *, seed: Optional[int] = None, options: Optional[Dict[str, Any]] = None) -> Tuple[np.ndarray, Dict[str, Any]]:
@@ -213,19 +295,19 @@ class MinecraftEnv(gym.Env):
         super().reset(seed=seed)
         
         # Reset the JavaScript environment
-        state_dict = self.bridge.reset()
-        self.current_state = state_dict
+        state = self.bridge.reset()
+        self.current_state = state
         
         # Reset step counter
         self.steps = 0
         self.total_logs_collected = 0
         
         # Process initial state
-        state_vector = self.process_state(state_dict)
+        state_vector = self.process_state(state)
         
         # Info dict
         info = {
-            "logs_collected": state_dict.get("inventory_logs", 0),
+            "logs_collected": int(state[STATE_INVENTORY_LOGS]),
             "steps": self.steps,
             "bot_id": self.bot_id
         }
@@ -233,6 +315,7 @@ class MinecraftEnv(gym.Env):
         return state_vector, info
     
     def close(self):
-        """Close the environment and ZeroMQ connection"""
-        if hasattr(self, 'bridge'):
-            self.bridge.close()
\ No newline at end of file
+        """Close the environment and ZeroMQ connection (safe to call more than once)"""
+        if not self._closed:
+            self.bridge.close()
+            self._closed = True
\ No newline at end of file
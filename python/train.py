@@ -8,7 +8,8 @@ import wandb
 from wandb.integration.sb3 import WandbCallback
 from stable_baselines3 import PPO
 
-from utils import make_parallel_envs
+from utils import make_parallel_envs, setup_bridge_logging
+from minecraft_bridge import LOCAL_HOSTS
 from callbacks import ParallelLoggingCallback
 
 def train_parallel_ppo(
@@ -18,12 +19,14 @@ def train_parallel_ppo(
     total_timesteps=100000,
     save_path="minecraft_ppo_parallel",
     learning_rate=3e-4,
-    n_steps=100,
-    batch_size=64,
+    n_steps=512,
+    batch_size=128,
     n_epochs=10,
     gamma=0.99,
     gae_lambda=0.95,
     clip_range=0.2,
+    use_subprocesses=False,
+    transport="tcp",
     verbose=1
 ):
     """
@@ -42,6 +45,8 @@ def train_parallel_ppo(
         gamma (float): Discount factor
         gae_lambda (float): Factor for trade-off of bias vs variance for Generalized Advantage Estimator
         clip_range (float): Clipping parameter for PPO
+        use_subprocesses (bool): Use one worker process per bot instead of the batch endpoint
+        transport (str): ZeroMQ transport to the JavaScript bridge, "tcp" or "ipc"
         verbose (int): Verbosity level
         
     Returns:
@@ -62,16 +67,24 @@ def train_parallel_ppo(
             "gae_lambda": gae_lambda,
             "clip_range": clip_range,
             "bridge_host": bridge_host,
-            "start_port": start_port
+            "start_port": start_port,
+            "use_subprocesses": use_subprocesses,
+            "transport": transport
         }
     )
     
+    # Bridge messages are only shown at verbose >= 2
+    setup_bridge_logging(verbose)
+    
     # Create vectorized environment
     print(f"Creating {num_envs} parallel environments...")
     env = make_parallel_envs(
         num_envs=num_envs,
         bridge_host=bridge_host,
-        start_port=start_port
+        start_port=start_port,
+        use_subprocesses=use_subprocesses,
+        verbose=verbose,
+        transport=transport
     )
     
     # Create PPO model
@@ -136,6 +149,8 @@ def train_parallel_ppo(
             print("Could not save model after error")
     
     finally:
+        # Send metrics still queued by the callback (learn() skips this when it raises)
+        logging_callback.close()
         # Close environment
         env.close()
         # Finish wandb run
@@ -150,8 +165,14 @@ if __name__ == "__main__":
     parser.add_argument("--port", type=int, default=5555, help="Base port for ZMQ communication")
     parser.add_argument("--num-bots", type=int, default=3, help="Number of bots to run in parallel")
     parser.add_argument("--timesteps", type=int, default=100000, help="Total timesteps to train")
+    parser.add_argument("--n-steps", type=int, default=512, help="Steps per bot collected before each PPO update (larger rollouts batch the policy forward passes)")
+    parser.add_argument("--batch-size", type=int, default=128, help="Minibatch size for PPO updates")
+    parser.add_argument("--subprocesses", action="store_true", help="Run one worker process per bot instead of the batch endpoint")
+    parser.add_argument("--transport", choices=["tcp", "ipc"], default="tcp", help="ZeroMQ transport; ipc (Unix domain sockets) needs the bridge on this machine, started with the same --transport")
     
     args = parser.parse_args()
+    if args.transport == "ipc" and args.host not in LOCAL_HOSTS:
+        parser.error(f"--transport ipc needs the bridge on this machine, got --host {args.host}")
     
     print(f"Training PPO agent with {args.num_bots} parallel bots")
     print(f"Connecting to JavaScript bridge at {args.host} starting at port {args.port}")
@@ -170,5 +191,9 @@ if __name__ == "__main__":
         bridge_host=args.host,
         start_port=args.port,
         total_timesteps=args.timesteps,
+        n_steps=args.n_steps,
+        batch_size=args.batch_size,
+        use_subprocesses=args.subprocesses,
+        transport=args.transport,
         save_path="minecraft_ppo_parallel"
     )
\ No newline at end of file
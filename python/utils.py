@@ -2,29 +2,78 @@
 Utility functions for RL environment setup and parallel processing
 """
 
-from stable_baselines3.common.vec_env import SubprocVecEnv
-from stable_baselines3.common.monitor import Monitor
+import atexit
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+
 from minecraft_env import MinecraftEnv
+from vec_env import MinecraftVecEnv, ShmemVecEnv
+
+# Background thread writing queued bridge log records
+_bridge_log_listener = None
+
+def _stop_bridge_log_listener():
+    """Flush and stop the bridge log thread, if running"""
+    global _bridge_log_listener
+    if _bridge_log_listener is not None:
+        _bridge_log_listener.stop()
+        _bridge_log_listener = None
+
+atexit.register(_stop_bridge_log_listener)
 
-def make_env(bridge_host="127.0.0.1", start_port=5555, bot_id=0):
+def setup_bridge_logging(verbose=0):
     """
-    Create a wrapped environment for Stable-Baselines3
+    Configure the "bridge" logger used by every MinecraftBridge in this process
+    
+    Messages are queued and written to stderr by a background thread, so a bot
+    never blocks on console output in the middle of a step. Warnings and errors
+    are always shown, info messages only from verbosity 2.
+    
+    Args:
+        verbose (int): Verbosity level
+    """
+    global _bridge_log_listener
+    _stop_bridge_log_listener()
+    
+    logger = logging.getLogger("bridge")
+    logger.handlers.clear()
+    logger.propagate = False
+    
+    log_queue = queue.SimpleQueue()
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("[%(name)s] %(message)s"))
+    _bridge_log_listener = QueueListener(log_queue, handler)
+    _bridge_log_listener.start()
+    
+    logger.addHandler(QueueHandler(log_queue))
+    logger.setLevel(logging.INFO if verbose >= 2 else logging.WARNING)
+
+def make_env(bridge_host="127.0.0.1", start_port=5555, bot_id=0, verbose=0, transport="tcp"):
+    """
+    Create an environment for Stable-Baselines3
+    
+    The environment is not wrapped with Monitor: ShmemVecEnv reports the episode
+    statistics itself.
     
     Args:
         bridge_host (str): Host where the JavaScript bridge is running
         start_port (int): Base port for ZMQ communication
         bot_id (int): Unique identifier for this bot
+        verbose (int): Verbosity level for bridge logging in the worker
+        transport (str): ZeroMQ transport, "tcp" or "ipc"
         
     Returns:
         callable: Function that creates and initializes the environment
     """
     def _init():
-        env = MinecraftEnv(bridge_host=bridge_host, bridge_port=start_port + bot_id, bot_id=bot_id)
-        # Wrap with Monitor for logging episode stats
-        return Monitor(env)
+        # Runs in the worker process, which does not inherit logging setup
+        setup_bridge_logging(verbose)
+        return MinecraftEnv(bridge_host=bridge_host, bridge_port=start_port + bot_id, bot_id=bot_id, transport=transport)
     return _init
 
-def make_parallel_envs(num_envs=3, bridge_host="127.0.0.1", start_port=5555):
+def make_parallel_envs(num_envs=3, bridge_host="127.0.0.1", start_port=5555, vec_port=None,
+                       use_subprocesses=False, verbose=0, transport="tcp"):
     """
     Create multiple environments for parallel training
     
@@ -32,9 +81,25 @@ def make_parallel_envs(num_envs=3, bridge_host="127.0.0.1", start_port=5555):
         num_envs (int): Number of parallel environments
         bridge_host (str): Host where the JavaScript bridge is running
         start_port (int): Base port for ZMQ communication
+        vec_port (int, optional): Port of the batch endpoint, start_port - 1 by default
+        use_subprocesses (bool): Run one MinecraftEnv worker process per bot on its own
+            port instead of stepping all bots through the batch endpoint
+        verbose (int): Verbosity level for bridge logging in the workers
+        transport (str): ZeroMQ transport, "tcp" or "ipc" (same machine only)
         
     Returns:
-        SubprocVecEnv: Vectorized environment with multiple parallel environments
+        VecEnv: MinecraftVecEnv, or ShmemVecEnv if use_subprocesses is set
     """
-    env_fns = [make_env(bridge_host=bridge_host, start_port=start_port, bot_id=i) for i in range(num_envs)]
-    return SubprocVecEnv(env_fns)
\ No newline at end of file
+    if use_subprocesses:
+        env_fns = [
+            make_env(bridge_host=bridge_host, start_port=start_port, bot_id=i, verbose=verbose, transport=transport)
+            for i in range(num_envs)
+        ]
+        # Observations come back through shared memory, only step results are pickled;
+        # ShmemVecEnv also reports the episode stats, no Monitor wrapper needed
+        return ShmemVecEnv(env_fns)
+    
+    if vec_port is None:
+        vec_port = start_port - 1
+    # Episode stats are reported by MinecraftVecEnv itself, no Monitor wrapper needed
+    return MinecraftVecEnv(num_envs=num_envs, bridge_host=bridge_host, vec_port=vec_port, transport=transport)
@@ -0,0 +1,363 @@
+"""
+Vectorized environment wrappers for running several Minecraft bots in parallel
+Provides a shared-memory subprocess wrapper and an in-process wrapper stepping all bots in one request
+"""
+
+import multiprocessing as mp
+import time
+from ctypes import c_float
+from typing import Any, Callable, List, Optional
+
+import gymnasium as gym
+import numpy as np
+from stable_baselines3.common.vec_env import SubprocVecEnv
+from stable_baselines3.common.vec_env.base_vec_env import (
+    CloudpickleWrapper, VecEnv, VecEnvIndices, VecEnvObs, VecEnvStepReturn
+)
+
+from minecraft_bridge import MinecraftVecBridge, STATE_INVENTORY_LOGS, STATE_SIZE
+from minecraft_env import OBS_SIZE, _normalize, _normalize_batch, make_spaces
+
+def _subproc_worker(remote, parent_remote, env_fn_wrapper, obs_buf):
+    """
+    Worker loop owning a single environment (and therefore its MinecraftBridge socket)
+
+    Observations are written straight into the shared buffer, so only rewards,
+    done flags and info dicts are pickled back to the parent process.
+
+    Mirrors stable_baselines3.common.vec_env.subproc_vec_env._worker as of
+    stable-baselines3 2.9.0 and must follow it on upgrades: every command
+    SubprocVecEnv sends is handled the same way, only the observations differ.
+
+    Args:
+        remote (Connection): Worker end of the command pipe
+        parent_remote (Connection): Parent end of the command pipe (closed here)
+        env_fn_wrapper (CloudpickleWrapper): Wrapped function creating the environment
+        obs_buf (mp.Array): Shared observation buffer for this environment
+    """
+    # Import here to avoid a circular import
+    from stable_baselines3.common.env_util import is_wrapped
+
+    parent_remote.close()
+    env = env_fn_wrapper.var()
+    obs_view = np.frombuffer(obs_buf, dtype=np.float32)
+    reset_info = {}
+    while True:
+        try:
+            cmd, data = remote.recv()
+            if cmd == "step":
+                observation, reward, terminated, truncated, info = env.step(data)
+                done = terminated or truncated
+                info["TimeLimit.truncated"] = truncated and not terminated
+                if done:
+                    # Copy the final observation, the shared buffer is about to be overwritten
+                    info["terminal_observation"] = np.array(observation, dtype=np.float32)
+                    observation, reset_info = env.reset()
+                obs_view[:] = observation
+                remote.send((reward, done, info, reset_info))
+            elif cmd == "reset":
+                maybe_options = {"options": data[1]} if data[1] else {}
+                observation, reset_info = env.reset(seed=data[0], **maybe_options)
+                obs_view[:] = observation
+                remote.send(reset_info)
+            elif cmd == "render":
+                remote.send(env.render())
+            elif cmd == "close":
+                env.close()
+                remote.close()
+                break
+            elif cmd == "get_spaces":
+                remote.send((env.observation_space, env.action_space))
+            elif cmd == "env_method":
+                method = env.get_wrapper_attr(data[0])
+                remote.send(method(*data[1], **data[2]))
+            elif cmd == "get_attr":
+                remote.send(env.get_wrapper_attr(data))
+            elif cmd == "has_attr":
+                try:
+                    env.get_wrapper_attr(data)
+                    remote.send(True)
+                except AttributeError:
+                    remote.send(False)
+            elif cmd == "set_attr":
+                remote.send(setattr(env, data[0], data[1]))
+            elif cmd == "is_wrapped":
+                remote.send(is_wrapped(env, data))
+            else:
+                raise NotImplementedError(f"`{cmd}` is not implemented in the worker")
+        except (EOFError, KeyboardInterrupt):
+            break
+
+class ShmemVecEnv(SubprocVecEnv):
+    """
+    SubprocVecEnv variant that returns observations through shared memory
+
+    SubprocVecEnv.__init__ is not called, so this relies on the attributes its
+    methods expect (remotes, processes, waiting, closed, and _seeds, _options
+    and reset_infos from VecEnv) as of stable-baselines3 2.9.0.
+
+    Each bot gets its own worker process, so the ZeroMQ round-trips of all bots
+    overlap instead of running one after the other. Workers write their 11-float
+    observation into a shared array; only the small step results cross the pipe.
+    """
+    def __init__(self, env_fns: List[Callable[[], gym.Env]], start_method: Optional[str] = "spawn"):
+        """
+        Initialize the worker processes
+
+        Args:
+            env_fns (list): Functions creating the environments, one per bot
+            start_method (str): Multiprocessing start method for the workers
+        """
+        self.waiting = False
+        self.closed = False
+        n_envs = len(env_fns)
+        ctx = mp.get_context(start_method)
+
+        # One shared observation buffer per environment. No lock is needed since
+        # the parent only reads a buffer after its worker has replied.
+        self.obs_bufs = [ctx.Array(c_float, OBS_SIZE, lock=False) for _ in range(n_envs)]
+        self.obs_views = [np.frombuffer(buf, dtype=np.float32) for buf in self.obs_bufs]
+
+        self.remotes, self.work_remotes = zip(*[ctx.Pipe() for _ in range(n_envs)])
+        self.processes = []
+        for work_remote, remote, env_fn, obs_buf in zip(self.work_remotes, self.remotes, env_fns, self.obs_bufs):
+            args = (work_remote, remote, CloudpickleWrapper(env_fn), obs_buf)
+            # daemon=True: if the main process crashes, we should not cause things to hang
+            process = ctx.Process(target=_subproc_worker, args=args, daemon=True)
+            process.start()
+            self.processes.append(process)
+            work_remote.close()
+
+        self.remotes[0].send(("get_spaces", None))
+        observation_space, action_space = self.remotes[0].recv()
+
+        # Episode statistics, reported in info["episode"] like the Monitor wrapper
+        self.episode_returns = np.zeros(n_envs, dtype=np.float64)
+        self.episode_lengths = np.zeros(n_envs, dtype=np.int64)
+        self._t_start = time.time()
+
+        VecEnv.__init__(self, n_envs, observation_space, action_space)
+
+    def step_wait(self) -> VecEnvStepReturn:
+        """
+        Wait for all workers and gather the step results
+
+        Returns:
+            tuple: (observations, rewards, dones, infos)
+        """
+        results = [remote.recv() for remote in self.remotes]
+        self.waiting = False
+        rews, dones, infos, self.reset_infos = zip(*results)
+        rewards = np.stack(rews)
+        dones = np.stack(dones)
+
+        self.episode_returns += rewards
+        self.episode_lengths += 1
+        done_idx = np.flatnonzero(dones)
+        if done_idx.size:
+            elapsed = round(time.time() - self._t_start, 6)
+            for i in done_idx:
+                infos[i]["episode"] = {"r": round(float(self.episode_returns[i]), 6), "l": int(self.episode_lengths[i]), "t": elapsed}
+            self.episode_returns[done_idx] = 0.0
+            self.episode_lengths[done_idx] = 0
+        return np.stack(self.obs_views), rewards, dones, infos
+
+    def reset(self) -> VecEnvObs:
+        """
+        Reset all environments
+
+        Returns:
+            np.ndarray: Stacked initial observations
+        """
+        for env_idx, remote in enumerate(self.remotes):
+            remote.send(("reset", (self._seeds[env_idx], self._options[env_idx])))
+        self.reset_infos = [remote.recv() for remote in self.remotes]
+        self.episode_returns[:] = 0.0
+        self.episode_lengths[:] = 0
+        # Seeds and options are only used once
+        self._reset_seeds()
+        self._reset_options()
+        return np.stack(self.obs_views)
+
+
+class MinecraftVecEnv(VecEnv):
+    """
+    Vectorized environment stepping every bot through one MinecraftVecBridge
+
+    step_async sends the actions of all bots in a single request and step_wait
+    receives all their results in a single reply, so a vectorized step is one
+    round-trip regardless of the number of bots, with no worker processes.
+    Each environment index is always the same bot: SB3 computes advantages per
+    index, so results cannot be handed out in arrival order.
+    """
+    def __init__(self, num_envs=3, bridge_host="127.0.0.1", vec_port=5554, max_steps=100, timeout=60000,
+                 transport="tcp"):
+        """
+        Connect to the batch endpoint of the JavaScript bridge
+
+        Args:
+            num_envs (int): Number of bots, environment i is the server's bot_i
+            bridge_host (str): Host where the JavaScript bridge is running
+            vec_port (int): Port of the batch endpoint
+            max_steps (int): Maximum steps per episode
+            timeout (int): Time to wait for all bots to reply in milliseconds
+            transport (str): ZeroMQ transport, "tcp" or "ipc"
+        """
+        self.bridge = MinecraftVecBridge(num_envs, host=bridge_host, port=vec_port, timeout=timeout, transport=transport)
+        self.max_steps = max_steps
+        self.render_mode = None
+        self.steps = np.zeros(num_envs, dtype=np.int64)
+        self.request_id = None
+        self._waiting = False
+
+        # Episode statistics, reported in info["episode"] like the Monitor wrapper
+        self.episode_returns = np.zeros(num_envs, dtype=np.float64)
+        self._t_start = time.time()
+
+        # Raw states from the bridge and their normalized observations
+        self._raw = np.zeros((num_envs, STATE_SIZE), dtype=np.float64)
+        self._obs = np.zeros((num_envs, OBS_SIZE), dtype=np.float32)
+
+        observation_space, action_space = make_spaces()
+        super(MinecraftVecEnv, self).__init__(num_envs, observation_space, action_space)
+
+    def _reset_envs(self, indices):
+        """
+        Reset the given bots concurrently and refresh their observations
+
+        Args:
+            indices (list): Indices of the environments to reset
+        """
+        for i, state in zip(indices, self.bridge.reset_bots(indices)):
+            self._raw[i] = state
+            _normalize(self._raw[i], self._obs[i])
+            self.steps[i] = 0
+
+    def reset(self) -> VecEnvObs:
+        """
+        Reset all bots
+
+        Returns:
+            np.ndarray: Stacked initial observations
+        """
+        self._reset_envs(range(self.num_envs))
+        self.episode_returns[:] = 0.0
+        self.reset_infos = [
+            {"logs_collected": int(self._raw[i, STATE_INVENTORY_LOGS]), "steps": 0, "bot_id": i}
+            for i in range(self.num_envs)
+        ]
+        # Seeds and options are not used by the bots
+        self._reset_seeds()
+        self._reset_options()
+        return self._obs.copy()
+
+    def step_async(self, actions: np.ndarray) -> None:
+        """
+        Send one action to every bot without waiting for the results
+
+        Args:
+            actions (np.ndarray): Action index for each bot
+        """
+        self.request_id = self.bridge.send_step(actions)
+        self._waiting = True
+
+    def step_wait(self) -> VecEnvStepReturn:
+        """
+        Wait for the results of all bots and reset those whose episode ended
+
+        Returns:
+            tuple: (observations, rewards, dones, infos)
+        """
+        results = self.bridge.recv_step(self.request_id)
+        self._waiting = False
+        self.steps += 1
+
+        # The server sends fixed-layout state arrays, converted for all bots at once
+        self._raw[:] = [result["next_state"] for result in results]
+        rewards = np.array([result["reward"] for result in results], dtype=np.float32)
+
+        dones = np.zeros(self.num_envs, dtype=bool)
+        terminal = np.zeros(self.num_envs, dtype=bool)
+        infos = []
+        for i, result in enumerate(results):
+            terminated = result["done"]
+            truncated = bool(self.steps[i] >= self.max_steps)
+            info = {
+                "logs_collected": int(self._raw[i, STATE_INVENTORY_LOGS]),
+                "steps": int(self.steps[i]),
+                "bot_id": i
+            }
+            # A failed request is not a real episode end, truncate so the value is bootstrapped
+            if result.get("error"):
+                truncated = True
+                terminated = False
+                info["bridge_error"] = True
+            dones[i] = terminated or truncated
+            terminal[i] = terminated and not truncated
+            info["TimeLimit.truncated"] = truncated and not terminated
+            infos.append(info)
+
+        # Normalize every bot in one call. The terminal observation is only used to
+        # bootstrap truncated episodes, so it is zeroed when the episode really ended
+        _normalize_batch(self._raw, self._obs)
+        self._obs[terminal] = 0.0
+
+        self.episode_returns += rewards
+        done_idx = np.flatnonzero(dones)
+        if done_idx.size:
+            elapsed = round(time.time() - self._t_start, 6)
+            for i in done_idx:
+                infos[i]["terminal_observation"] = self._obs[i].copy()
+                infos[i]["episode"] = {"r": round(float(self.episode_returns[i]), 6), "l": int(self.steps[i]), "t": elapsed}
+            self.episode_returns[done_idx] = 0.0
+            self._reset_envs(done_idx)
+
+        return self._obs.copy(), rewards, dones, infos
+
+    def close(self) -> None:
+        """Close the connection to the JavaScript bridge"""
+        if self._waiting:
+            self.bridge.recv_step(self.request_id)
+        self.bridge.close()
+
+    def get_attr(self, attr_name: str, indices: VecEnvIndices = None) -> List[Any]:
+        """
+        Return an attribute of this wrapper once per environment
+
+        Args:
+            attr_name (str): Name of the attribute
+            indices (list, optional): Environments to query
+
+        Returns:
+            list: Attribute value for each environment
+        """
+        return [getattr(self, attr_name) for _ in self._get_indices(indices)]
+
+    def set_attr(self, attr_name: str, value: Any, indices: VecEnvIndices = None) -> None:
+        """
+        Set an attribute of this wrapper (shared by all environments)
+
+        Args:
+            attr_name (str): Name of the attribute
+            value: New value
+            indices (list, optional): Environments to update
+        """
+        setattr(self, attr_name, value)
+
+    def env_method(self, method_name: str, *method_args, indices: VecEnvIndices = None, **method_kwargs) -> List[Any]:
+        """
+        Not supported: the bots are stepped together and have no per-environment object
+
+        Raises:
+            NotImplementedError: Always
+        """
+        raise NotImplementedError("MinecraftVecEnv has no per-environment objects to call methods on")
+
+    def env_is_wrapped(self, wrapper_class: type, indices: VecEnvIndices = None) -> List[bool]:
+        """
+        Check if environments are wrapped with a given wrapper (never the case here)
+
+        Returns:
+            list: False for each environment
+        """
+        return [False for _ in self._get_indices(indices)]
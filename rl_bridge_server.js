@@ -1,11 +1,52 @@
 /**
  * RLBridgeServer - Serves as a bridge between Python RL agents and JavaScript Mineflayer bots
- * Uses ZeroMQ for communication with Python
+ * Uses ZeroMQ with MessagePack payloads for communication with Python
  */
 const mineflayer = require('mineflayer');
 const zmq = require('zeromq');
+const { encode, decode } = require('@msgpack/msgpack');
 const BotActions = require('./bot_actions');
 
+// Observation reported while a bot has no valid state yet
+const EMPTY_STATE = {
+  position: {x: 0, y: 0, z: 0},
+  yaw: 0, pitch: 0,
+  inventory_logs: 0,
+  tree_visible: false,
+  closest_log: null
+};
+
+/**
+ * Flatten an observation into the fixed-length binary state sent to Python,
+ * little-endian float64 values (MessagePack bin, read with np.frombuffer):
+ * [x, y, z, yaw, pitch, inventory_logs, tree_visible, log_distance, log_x, log_z, has_log]
+ */
+function packState(state) {
+  const s = state || EMPTY_STATE;
+  const log = s.closest_log;
+  const values = [
+    s.position.x, s.position.y, s.position.z,
+    s.yaw, s.pitch,
+    s.inventory_logs,
+    s.tree_visible ? 1 : 0,
+    log ? log.distance : 0,
+    log ? log.x : 0,
+    log ? log.z : 0,
+    log ? 1 : 0
+  ];
+  const buffer = Buffer.allocUnsafe(values.length * 8);
+  values.forEach((value, i) => buffer.writeDoubleLE(value, i * 8));
+  return buffer;
+}
+
+/**
+ * ZeroMQ address to bind for a port: a Unix domain socket named after the port
+ * for the ipc transport (same-machine clients only), TCP loopback otherwise
+ */
+function bindEndpoint(port, transport) {
+  return transport === 'ipc' ? `ipc:///tmp/mineflayer-${port}` : `tcp://127.0.0.1:${port}`;
+}
+
 class RLBridgeServer {
   constructor(options = {}) {
     this.serverOptions = {
@@ -13,10 +54,14 @@ class RLBridgeServer {
       port: options.port || 25565,
       basePort: options.basePort || 5555,
       numBots: options.numBots || 6,
+      transport: options.transport || 'tcp',
     };
+    // Port of the endpoint stepping all bots at once (defaults to the port below basePort)
+    this.serverOptions.vecPort = options.vecPort || this.serverOptions.basePort - 1;
     
     // Map to store bot instances: Map<botId, {socket, bot, actions, currentState, isConnected}>
     this.bots = new Map();
+    this.vecSocket = null;
     this.shuttingDown = false;
   }
 
@@ -40,6 +85,8 @@ class RLBridgeServer {
       if (this.bots.size === 0) {
         throw new Error("No bots could be initialized. Check Minecraft server connectivity.");
       }
+      
+      await this.initializeVecSocket();
     } catch (error) {
       console.error("Error during initialization:", error);
       await this.shutdown();
@@ -51,9 +98,9 @@ class RLBridgeServer {
     console.log(`Initializing ${botId} with ZMQ port ${zmqPort}...`);
 
     try {
-      // Set up ZMQ Reply socket
-      const socket = new zmq.Reply();
-      const bindAddress = `tcp://127.0.0.1:${zmqPort}`;
+      // Set up ZMQ Router socket (Python side connects with a DEALER)
+      const socket = new zmq.Router();
+      const bindAddress = bindEndpoint(zmqPort, this.serverOptions.transport);
       await socket.bind(bindAddress);
       console.log(`[${botId}] ZMQ socket bound to ${bindAddress}`);
       
@@ -227,24 +274,29 @@ class RLBridgeServer {
     console.log(`[${botId}] Starting message loop...`);
     
     while (botData.isConnected && !this.shuttingDown) {
+      // Routing id of the peer that sent the current request, and the request itself
+      let identity = null;
+      let request = null;
+      
       try {
-        // Wait for message
-        const [message] = await botData.socket.receive();
+        // Wait for message: [identity, empty delimiter, payload]
+        const frames = await botData.socket.receive();
+        identity = frames[0];
+        const message = frames[frames.length - 1];
         
         // Check if we're still connected
         if (!botData.isConnected || this.shuttingDown) break;
         
         // Process message
-        let request;
         try {
-          request = JSON.parse(message.toString());
+          request = decode(message);
         } catch (e) {
-          console.error(`[${botId}] Invalid JSON received:`, e.message);
+          console.error(`[${botId}] Invalid MessagePack received:`, e.message);
           if (botData.socket && !botData.socket.closed) {
-            await botData.socket.send(JSON.stringify({
+            await botData.socket.send([identity, '', encode({
               status: 'error',
-              message: 'Invalid JSON'
-            }));
+              message: 'Invalid MessagePack'
+            })]);
           }
           continue;
         }
@@ -263,37 +315,19 @@ class RLBridgeServer {
           // Process request based on type
           switch (request.type) {
             case 'get_state':
-              response.state = botData.currentState || this.getObservation(botId) || {
-                position: {x: 0, y: 0, z: 0},
-                yaw: 0, pitch: 0,
-                inventory_logs: 0,
-                tree_visible: false,
-                closest_log: null
-              };
+              response.state = packState(botData.currentState || this.getObservation(botId));
               break;
               
             case 'take_action':
               const result = await this.executeAction(botId, request.action);
               response.reward = result.reward;
-              response.next_state = botData.currentState || {
-                position: {x: 0, y: 0, z: 0},
-                yaw: 0, pitch: 0,
-                inventory_logs: 0,
-                tree_visible: false,
-                closest_log: null
-              };
+              response.next_state = packState(botData.currentState);
               response.done = result.done;
               break;
               
             case 'reset':
               await this.resetBot(botId);
-              response.state = botData.currentState || {
-                position: {x: 0, y: 0, z: 0},
-                yaw: 0, pitch: 0,
-                inventory_logs: 0,
-                tree_visible: false,
-                closest_log: null
-              };
+              response.state = packState(botData.currentState);
               break;
               
             case 'close':
@@ -317,12 +351,15 @@ class RLBridgeServer {
           }
         }
         
+        // Echo the correlation id so the Python side can match the reply
+        response.id = request.id;
+        
         // Small delay to avoid overwhelming the socket
         await new Promise(resolve => setTimeout(resolve, 200));
         
         // Send response
         if (botData.socket && !botData.socket.closed) {
-          await botData.socket.send(JSON.stringify(response));
+          await botData.socket.send([identity, '', encode(response)]);
         } else {
           console.warn(`[${botId}] Socket closed before sending response`);
           botData.isConnected = false;
@@ -337,12 +374,14 @@ class RLBridgeServer {
         }
         
         // Try to send error response
-        if (botData.isConnected && botData.socket && !botData.socket.closed && !this.shuttingDown) {
+        if (identity && botData.isConnected && botData.socket && !botData.socket.closed && !this.shuttingDown) {
           try {
-            await botData.socket.send(JSON.stringify({
+            // Echo the correlation id so the Python side gets the error at once
+            await botData.socket.send([identity, '', encode({
               status: 'error',
-              message: `[${botId}] ${error.message || 'Unknown error'}`
-            }));
+              message: `[${botId}] ${error.message || 'Unknown error'}`,
+              id: request && request.id
+            })]);
           } catch (sendError) {
             console.error(`[${botId}] Failed to send error response:`, sendError.message);
             botData.isConnected = false;
@@ -358,6 +397,124 @@ class RLBridgeServer {
     await this.cleanupBot(botId);
   }
 
+  async initializeVecSocket() {
+    // Router for MinecraftVecBridge: one request carries the actions of every bot
+    const socket = new zmq.Router();
+    const bindAddress = bindEndpoint(this.serverOptions.vecPort, this.serverOptions.transport);
+    await socket.bind(bindAddress);
+    this.vecSocket = socket;
+    console.log(`[vec] ZMQ socket bound to ${bindAddress}`);
+    
+    this.startVecLoop();
+  }
+
+  async startVecLoop() {
+    const socket = this.vecSocket;
+    
+    while (!this.shuttingDown && !socket.closed) {
+      // Routing id of the peer that sent the current request, and the request itself
+      let identity = null;
+      let request = null;
+      
+      try {
+        // Wait for message: [identity, empty delimiter, payload]
+        const frames = await socket.receive();
+        identity = frames[0];
+        request = decode(frames[frames.length - 1]);
+        
+        let response;
+        switch (request.type) {
+          case 'batch_step':
+            // actions[i] is the action of bot_i, all bots act concurrently
+            response = {
+              status: 'ok',
+              results: await Promise.all(
+                request.actions.map((action, i) => this.stepBot(`bot_${i}`, action))
+              )
+            };
+            break;
+            
+          case 'batch_reset':
+            response = {
+              status: 'ok',
+              results: await Promise.all(
+                request.bots.map(i => this.resetBotState(`bot_${i}`))
+              )
+            };
+            break;
+            
+          case 'close':
+            // The bots keep running for per-bot clients
+            response = { status: 'ok', message: '[vec] Client closed' };
+            break;
+            
+          default:
+            response = { 
+              status: 'error', 
+              message: `[vec] Unknown request type: ${request.type}` 
+            };
+        }
+        
+        // Echo the correlation id so the Python side can match the reply
+        response.id = request.id;
+        await socket.send([identity, '', encode(response)]);
+      } catch (error) {
+        if (this.shuttingDown || socket.closed) break;
+        console.error(`[vec] Error in message loop:`, error.message);
+        
+        // Try to send error response
+        if (identity) {
+          try {
+            // Echo the correlation id so the Python side gets the error at once
+            await socket.send([identity, '', encode({
+              status: 'error',
+              message: `[vec] ${error.message || 'Unknown error'}`,
+              id: request && request.id
+            })]);
+          } catch (sendError) {
+            console.error(`[vec] Failed to send error response:`, sendError.message);
+          }
+        }
+      }
+    }
+    
+    console.log(`[vec] Message loop ended`);
+  }
+
+  isBotReady(botData) {
+    return Boolean(botData && botData.isConnected && botData.bot && botData.bot.entity &&
+      botData.actions && botData.bot.mcData);
+  }
+
+  async stepBot(botId, actionIndex) {
+    const botData = this.bots.get(botId);
+    if (!this.isBotReady(botData)) {
+      return { status: 'error', message: `[${botId}] Bot not fully initialized` };
+    }
+    
+    try {
+      const result = await this.executeAction(botId, actionIndex);
+      return {
+        status: 'ok',
+        reward: result.reward,
+        next_state: packState(botData.currentState),
+        done: result.done
+      };
+    } catch (error) {
+      return { status: 'error', message: `[${botId}] ${error.message || 'Unknown error'}` };
+    }
+  }
+
+  async resetBotState(botId) {
+    const botData = this.bots.get(botId);
+    if (!this.isBotReady(botData)) {
+      return { status: 'error', message: `[${botId}] Bot not fully initialized` };
+    }
+    
+    await this.resetBot(botId);
+    return { status: 'ok', state: packState(botData.currentState) };
+  }
+
   async executeAction(botId, actionIndex) {
     await new Promise(resolve => setTimeout(resolve, 500));
     const botData = this.bots.get(botId);
@@ -441,7 +598,7 @@ class RLBridgeServer {
     return {
       status: 'ok',
       rewards,
-      next_state: finalState,
+      next_state: packState(finalState || botData.currentState),
       done
     };
   }
@@ -513,6 +670,10 @@ class RLBridgeServer {
     
     this.shuttingDown = true;
     
+    if (this.vecSocket && !this.vecSocket.closed) {
+      this.vecSocket.close();
+    }
+    
     // Close all bots
     const cleanupPromises = [];
     for (const botId of this.bots.keys()) {